@@ -23,6 +23,10 @@ setup(name='yahoo_fantasy_api',
           'License :: OSI Approved :: MIT License',
           'Programming Language :: Python :: 3.7',
       ],
-      install_requires=['objectpath', 'pytz'],
-      python_requires='>=3',
+      install_requires=['objectpath', 'pytz', 'requests',
+                        'urllib3>=1.26'],
+      extras_require={'async': ['aiohttp'], 'orjson': ['orjson'],
+                      'uvloop': ['uvloop>=0.18'], 'brotli': ['brotli'],
+                      'stream': ['ijson']},
+      python_requires='>=3.7',
       zip_safe=False)
@@ -0,0 +1,275 @@
+#!/bin/python
+
+import asyncio
+import json
+import weakref
+import aiohttp
+from yahoo_fantasy_api import yhandler
+
+_POOL_LIMIT = 20
+_KEEPALIVE_TIMEOUT = 60
+_TIMEOUT = aiohttp.ClientTimeout(sock_connect=yhandler._TIMEOUT[0],
+                                 sock_read=yhandler._TIMEOUT[1])
+# Handlers with an open aiohttp session, so that run can close the sessions
+# opened on its loop before the loop goes away.
+_OPEN_HANDLERS = weakref.WeakSet()
+
+
+def run(main):
+    """Run a coroutine to completion on a new event loop
+
+    The loop is from uvloop when it is installed, whose lower per-request
+    overhead helps callers that issue a large number of requests.
+    Otherwise the default asyncio loop is used.  The aiohttp sessions that
+    handlers open during the run are closed before it returns, so the same
+    handler can be used in later runs.
+
+    >>> async def main():
+    ...     async with AsyncYHandler(sc) as yh:
+    ...         return await yh.get_players_raw_range(lg_id, 0, 500, 'A')
+    >>> pages = run(main())
+
+    :param main: Coroutine to run
+    :return: What the coroutine returns
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(_close_after(main))
+    return uvloop.run(_close_after(main))
+
+
+async def _close_after(main):
+    try:
+        return await main
+    finally:
+        loop = asyncio.get_running_loop()
+        for yh in list(_OPEN_HANDLERS):
+            if yh._client_loop is loop:
+                await yh.close()
+
+
+class AsyncYHandler(yhandler.YHandler):
+    """Class that sends the APIs to Yahoo without blocking
+
+    This has the same methods as :class:`YHandler`, but each one is a
+    coroutine, or an async generator for get_players_raw_stream.  The benefit
+    comes from requesting unrelated resources concurrently, so that the total
+    time is that of the slowest request rather than the sum of all of them:
+
+    >>> async with AsyncYHandler(sc) as yh:
+    ...     standings, settings, scoreboard = await asyncio.gather(
+    ...         yh.get_standings_raw(league_id),
+    ...         yh.get_settings_raw(league_id),
+    ...         yh.get_scoreboard_raw(league_id))
+
+    Requests are authorized with the access token of the session context.
+    Refreshing the token, if it expired, is left to the caller.
+
+    :param sc: Fully constructed session context
+    :type sc: :class:`yahoo_oauth.OAuth2`
+    """
+    def __init__(self, sc):
+        super().__init__(sc)
+        self._client_session = None
+        self._client_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _client(self):
+        """Return the aiohttp session, creating it on first use
+
+        A session can only be used on the loop it was created on.  When
+        called from another loop a new session is created.  The old one is
+        closed on its loop if that loop still runs elsewhere.  Otherwise the
+        loop has stopped, along with the old session's connections, and the
+        old session is just dropped.
+
+        :return: The session to send the API requests through
+        :rtype: :class:`aiohttp.ClientSession`
+        """
+        loop = asyncio.get_running_loop()
+        if self._client_session is not None and self._client_loop is not loop:
+            if self._client_loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._client_session.close(),
+                                                 self._client_loop)
+            self._client_session = None
+        if self._client_session is None or self._client_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=_POOL_LIMIT, keepalive_timeout=_KEEPALIVE_TIMEOUT)
+            self._client_session = aiohttp.ClientSession(connector=connector,
+                                                         timeout=_TIMEOUT)
+            self._client_loop = loop
+            _OPEN_HANDLERS.add(self)
+        return self._client_session
+
+    def _auth_headers(self, headers=None):
+        auth = {'Authorization': f"Bearer {self.sc.access_token}"}
+        if headers is not None:
+            auth.update(headers)
+        return auth
+
+    async def close(self):
+        """Close the underlying aiohttp session and its connections"""
+        if self._client_session is not None:
+            await self._client_session.close()
+            self._client_session = None
+            _OPEN_HANDLERS.discard(self)
+        self._client_loop = None
+
+    async def _request(self, method, uri, expected_status=None, **kwargs):
+        """Send a request for the URI through the aiohttp session
+
+        :param method: HTTP method of the request
+        :type method: str
+        :param uri: URI of the API to call
+        :type uri: str
+        :param expected_status: Status code the response must have.  If None,
+        any successful status is accepted.
+        :type expected_status: int
+        :param kwargs: Additional arguments to pass to the session
+        :return: Response of the request and its body
+        :rtype: (:class:`aiohttp.ClientResponse`, bytes)
+        :raises: RuntimeError if the response doesn't have the expected status
+        """
+        headers = self._auth_headers(kwargs.pop('headers', None))
+        async with self._client().request(method, self._base + uri,
+                                          headers=headers, **kwargs) \
+                as response:
+            content = await response.read()
+        if expected_status is None:
+            if not response.ok:
+                raise RuntimeError(content)
+        elif response.status != expected_status:
+            raise RuntimeError(content)
+        return response, content
+
+    async def get(self, uri):
+        """Send an API request to the URI and return the response as JSON
+
+        :param uri: URI of the API to call
+        :type uri: str
+        :return: JSON document of the response.  This is empty if the
+        response has no content.
+        :raises: RuntimeError if any response comes back with an error
+        """
+        response, content = await self._request("GET", uri,
+                                                params=yhandler._FORMAT_JSON)
+        if response.status == 204 or not content:
+            return {}
+        jresp = yhandler._json_loads(content)
+        if "error" in jresp:
+            raise RuntimeError(json.dumps(jresp))
+        return jresp
+
+    async def _get_cached(self, uri):
+        """Like get, but return the response of a prior call to the same URI
+
+        The same document is returned to every caller, so it must not be
+        changed.
+
+        :param uri: URI of the API to call
+        :type uri: str
+        :return: JSON document of the response
+        """
+        jresp = self._cache_lookup(uri)
+        if jresp is None:
+            jresp = await self.get(uri)
+            self._cache_store(uri, jresp)
+        return jresp
+
+    async def multi_get(self, uris):
+        """Call get for each URI concurrently
+
+        :param uris: URIs of the APIs to call
+        :type uris: list(str)
+        :return: JSON document of each response, in the order of the URIs
+        :rtype: list
+        """
+        return list(await asyncio.gather(*[self.get(uri) for uri in uris]))
+
+    async def put(self, uri, data):
+        """Calls the PUT method to the uri with a payload
+
+        :param uri: URI of the API to call
+        :type uri: str
+        :param data: What to pass as the payload
+        :type data: str
+        :return: XML document of the response
+        :raises: RuntimeError if any response comes back with an error
+        """
+        response, _ = await self._request("PUT", uri, 200, data=data,
+                                          headers=yhandler._XML_HEADERS)
+        return response
+
+    async def post(self, uri, data):
+        """Calls the POST method to the URI with a payload
+
+        :param uri: URI of the API to call
+        :type uri: str
+        :param data: What to pass as the payload
+        :type data: str
+        :return: XML document of the response
+        :raises: RuntimeError if any response comes back with an error
+        """
+        response, _ = await self._request("POST", uri, 201, data=data,
+                                          headers=yhandler._XML_HEADERS)
+        return response
+
+    async def get_percent_owned_raw(self, league_id, player_ids):
+        """Return the raw JSON when requesting the percentage owned of players
+
+        :param league_id: League ID we are requesting data from
+        :type league_id: str
+        :param player_ids: Yahoo! Player IDs to retrieve % owned for
+        :type player_ids: list(str)
+        :return: JSON document of the request
+        """
+        uris = self._percent_owned_uris(league_id, player_ids)
+        return yhandler._merge_players(await self.multi_get(uris))
+
+    async def get_players_raw_stream(self, league_id, start, status,
+                                     position=None,
+                                     fields=("player_id", "name", "status")):
+        """Yield the players in the league one at a time as they are parsed
+
+        This is an async generator, used with ``async for``.  See
+        :meth:`YHandler.get_players_raw_stream`.
+
+        :param league_id: League ID to get the players for
+        :type league_id: str
+        :param start: The output is paged at 25 players each time.  See
+        get_players_raw.
+        :type start: int
+        :param status: A filter to limit the player status.  See
+        get_players_raw for the available values.
+        :type status: str
+        :param position: A filter to return players only for a specific
+        position.  If None is passed, then no position filtering occurs.
+        :type position: str
+        :param fields: Fields of each player to return
+        :type fields: tuple(str)
+        :return: Async generator of a dict for each player with the requested
+        fields
+        :raises: RuntimeError if the response comes back with an error
+        """
+        parser, players = yhandler._players_parser()
+        uri = self._players_uri(league_id, start, status, position)
+        async with self._client().get(self._base + uri,
+                                      params=yhandler._FORMAT_JSON,
+                                      headers=self._auth_headers()) \
+                as response:
+            if not response.ok:
+                raise RuntimeError(await response.read())
+            async for chunk in response.content.iter_chunked(
+                    yhandler._STREAM_CHUNK_SIZE):
+                parser.send(chunk)
+                for key, plyr in players:
+                    if key != 'count':
+                        yield yhandler._player_fields(plyr, fields)
+                del players[:]
+        parser.close()
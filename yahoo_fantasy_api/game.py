@@ -15,7 +15,7 @@ class Game:
     def __init__(self, sc, code):
         self.sc = sc
         self.code = code
-        self.yhandler = yhandler.YHandler(sc)
+        self.yhandler = yhandler.get_handler(sc)
 
     def inject_yhandler(self, yhandler):
         self.yhandler = yhandler
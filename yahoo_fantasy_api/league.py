@@ -18,7 +18,7 @@ class League:
     def __init__(self, sc, league_id):
         self.sc = sc
         self.league_id = league_id
-        self.yhandler = yhandler.YHandler(sc)
+        self.yhandler = yhandler.get_handler(sc)
         self.current_week_cache = None
         self.end_week_cache = None
         self.week_date_range_cache = {}
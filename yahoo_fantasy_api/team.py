@@ -19,7 +19,7 @@ class Team:
         self.team_key = team_key
         self.league_id = team_key[0:team_key.find(".t")]
         self.league_prefix = team_key[0:team_key.find('.')]
-        self.yhandler = yhandler.YHandler(sc)
+        self.yhandler = yhandler.get_handler(sc)
 
     def inject_yhandler(self, yhandler):
         self.yhandler = yhandler
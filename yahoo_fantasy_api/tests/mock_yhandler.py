@@ -31,7 +31,7 @@ class YHandler:
         with open(self.dir_path + "/sample.standings.json", "r") as f:
             return json.load(f)
 
-    def get_settings_raw(self, league_id):
+    def get_settings_raw(self, league_id, cache_ok=False):
         """Return the raw JSON when requesting settings for a league.
 
         :param league_id: League ID to get the standings for
@@ -41,7 +41,7 @@ class YHandler:
         with open(self.dir_path + "/sample.league_settings.json", "r") as f:
             return json.load(f)
 
-    def get_matchup_raw(self, team_key, week):
+    def get_matchup_raw(self, team_key, week, cache_ok=False):
         """Return the raw JSON when requesting match-ups for a team
 
         :param team_key: Team key identifier to find the matchups for
@@ -67,7 +67,7 @@ class YHandler:
         with open(self.dir_path + "/sample.team_roster.json", "r") as f:
             return json.load(f)
 
-    def get_scoreboard_raw(self, league_id, week=None):
+    def get_scoreboard_raw(self, league_id, week=None, cache_ok=False):
         """Return the raw JSON when requesting the scoreboard for a week
 
         :param league_id: League ID to get the standings for
@@ -0,0 +1,161 @@
+#!/bin/python
+
+import pytest
+import asyncio
+import os
+import threading
+from unittest.mock import MagicMock
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from yahoo_fantasy_api import async_yhandler  # noqa: E402
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, "http://127.0.0.1:{}/".format(port)
+
+
+def test_get():
+    async def handler(request):
+        assert(request.headers['Authorization'] == 'Bearer tok')
+        assert(request.query['format'] == 'json')
+        if request.path == '/league/1/standings':
+            return web.json_response({'path': request.path})
+        return web.json_response({'error': 'bad'})
+
+    async def run():
+        runner, base = await _serve(handler)
+        sc = MagicMock()
+        sc.access_token = 'tok'
+        try:
+            async with async_yhandler.AsyncYHandler(sc) as yh:
+                yh._base = base
+                jresp, other = await asyncio.gather(
+                    yh.get_standings_raw('1'),
+                    yh.get_settings_raw('1'),
+                    return_exceptions=True)
+        finally:
+            await runner.cleanup()
+        assert(jresp == {'path': '/league/1/standings'})
+        assert(isinstance(other, RuntimeError))
+
+    asyncio.run(run())
+
+
+def test_players_raw_range():
+    async def get(uri):
+        return uri
+
+    async def run():
+        yh = async_yhandler.AsyncYHandler('dummy-sc')
+        yh.get = get
+        return await yh.get_players_raw_range('370.l.56877', 0, 50, 'FA')
+
+    pages = asyncio.run(run())
+    assert(pages == [
+        "league/370.l.56877/players;start={};count=25;status=FA"
+        "/percent_owned".format(i) for i in (0, 25)])
+
+
+def test_run():
+    async def main():
+        return 42
+
+    assert(async_yhandler.run(main()) == 42)
+
+
+def test_players_raw_stream():
+    pytest.importorskip("ijson")
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    with open(dir_path + "/sample.players.freeagents.C.pg.1.json", "rb") as f:
+        content = f.read()
+
+    async def handler(request):
+        assert(request.path == '/league/370.l.56877/players;start=0;count=25;'
+               'status=FA;position=C/percent_owned')
+        return web.Response(body=content, content_type='application/json')
+
+    async def run():
+        runner, base = await _serve(handler)
+        sc = MagicMock()
+        sc.access_token = 'tok'
+        try:
+            async with async_yhandler.AsyncYHandler(sc) as yh:
+                yh._base = base
+                return [p async for p in yh.get_players_raw_stream(
+                    '370.l.56877', 0, 'FA', 'C')]
+        finally:
+            await runner.cleanup()
+
+    plyrs = asyncio.run(run())
+    assert(len(plyrs) == 25)
+    assert(plyrs[0]['player_id'] == '1600')
+    assert(plyrs[0]['name']['full'] == 'Joe Thornton')
+
+
+def test_players_raw_stream_error():
+    pytest.importorskip("ijson")
+
+    async def handler(request):
+        return web.json_response({'error': {'description': 'Invalid league'}})
+
+    async def run():
+        runner, base = await _serve(handler)
+        sc = MagicMock()
+        sc.access_token = 'tok'
+        try:
+            async with async_yhandler.AsyncYHandler(sc) as yh:
+                yh._base = base
+                return [p async for p in yh.get_players_raw_stream(
+                    '1', 0, 'A')]
+        finally:
+            await runner.cleanup()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+def test_run_twice_on_one_handler():
+    async def handler(request):
+        return web.json_response({'path': request.path})
+
+    async def serve():
+        return await _serve(handler)
+
+    loop = asyncio.new_event_loop()
+    runner, base = loop.run_until_complete(serve())
+    server = threading.Thread(target=loop.run_forever, daemon=True)
+    server.start()
+    sc = MagicMock()
+    sc.access_token = 'tok'
+    yh = async_yhandler.AsyncYHandler(sc)
+    yh._base = base
+    try:
+        assert(async_yhandler.run(yh.get("a")) == {'path': '/a'})
+        assert(yh._client_session is None)
+        assert(async_yhandler.run(yh.get("b")) == {'path': '/b'})
+        assert(yh._client_session is None)
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        server.join()
+        loop.close()
+
+
+def test_client_on_new_loop():
+    # A session left open by one loop isn't reused on another
+    async def client(yh):
+        return yh._client()
+
+    yh = async_yhandler.AsyncYHandler('dummy-sc')
+    first = asyncio.run(client(yh))
+    second = asyncio.run(client(yh))
+    assert(first is not second)
+    asyncio.run(yh.close())
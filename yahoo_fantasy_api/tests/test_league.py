@@ -3,6 +3,8 @@
 import yahoo_fantasy_api as yfa
 import datetime
 import pytest
+from unittest.mock import MagicMock
+from yahoo_fantasy_api import yhandler
 
 
 def test_standings(mock_league):
@@ -143,3 +145,16 @@ def test_positions(mock_league):
     assert('2B' in ps)
     assert(ps['2B']['count'] == 1)
     assert(ps['2B']['position_type'] == 'B')
+
+
+def test_fresh_league_gets_updated_settings():
+    sc = MagicMock()
+    docs = iter(['2019-10-07', '2019-10-08'])
+    yh = yhandler.get_handler(sc)
+    yh.get = MagicMock(side_effect=lambda uri: {
+        'fantasy_content': {'league': [{'edit_key': next(docs)}]}})
+    lg = yfa.League(sc, '396.l.49770')
+    assert(lg.edit_date() == datetime.date(2019, 10, 7))
+    lg = yfa.League(sc, '396.l.49770')
+    assert(lg.yhandler is yh)
+    assert(lg.edit_date() == datetime.date(2019, 10, 8))
@@ -1,8 +1,12 @@
 #!/bin/python
 
+import pytest
 from yahoo_fantasy_api import yhandler
 from unittest.mock import MagicMock
 import datetime
+import json
+import os
+import requests
 
 
 def test_matchup(mock_team):
@@ -17,7 +21,217 @@ def test_roster_raw():
     yh.get_roster_raw(team_key, week=10)
     yh.get.assert_called_with("team/{}/roster;week=10".format(team_key))
     yh.get_roster_raw(team_key, day=datetime.date(2019, 10, 7))
+    yh.get.assert_called_with("team/{}/roster;date=2019-10-07".format(
+        team_key))
+    yh.get_roster_raw(team_key, day=datetime.datetime(2019, 10, 7, 13, 30))
     yh.get.assert_called_with("team/{}/roster;date=2019-10-07".format(
         team_key))
     yh.get_roster_raw(team_key)
     yh.get.assert_called_with("team/{}/roster".format(team_key))
+
+
+def test_pooled_session():
+    sc = MagicMock()
+    sc.session = requests.Session()
+    yh = yhandler.YHandler(sc)
+    assert(yh._pooled_session() == sc.session.request)
+    adapter = sc.session.get_adapter(yhandler.YAHOO_ENDPOINT)
+    assert(adapter._pool_maxsize == 20)
+    assert(adapter.max_retries.total == 3)
+    assert("POST" not in adapter.max_retries.allowed_methods)
+    # A refreshed session on the context gets configured on next use
+    sc.session = requests.Session()
+    assert(yh._pooled_session() == sc.session.request)
+    adapter = sc.session.get_adapter(yhandler.YAHOO_ENDPOINT)
+    assert(adapter._pool_maxsize == 20)
+
+
+def test_players_raw_range():
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(side_effect=lambda uri: uri)
+    pages = yh.get_players_raw_range('370.l.56877', 0, 75, 'FA', 'C')
+    assert(pages == [
+        "league/370.l.56877/players;start={};count=25;status=FA;position=C"
+        "/percent_owned".format(i) for i in (0, 25, 50)])
+    assert(yh.get_players_raw_range('370.l.56877', 25, 25, 'FA') == [])
+
+
+def test_get():
+    sc = MagicMock()
+    response = sc.session.request.return_value
+    response.content = b'{"fantasy_content": {"a": 1}}'
+    yh = yhandler.YHandler(sc)
+    assert(yh.get("league/1/standings") == {"fantasy_content": {"a": 1}})
+    sc.session.request.assert_called_with(
+        "GET", yhandler.YAHOO_ENDPOINT + "/league/1/standings",
+        timeout=(3.05, 30), params={'format': 'json'})
+    response.content = b'{"error": {"description": "x"}}'
+    with pytest.raises(RuntimeError):
+        yh.get("league/1/standings")
+
+
+def test_cached_raw():
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(side_effect=lambda uri: {'uri': uri})
+    yh.get_settings_raw('1')
+    yh.get_settings_raw('1')
+    assert(yh.get.call_count == 2)
+    yh.get_settings_raw('1', cache_ok=True)
+    assert(yh.get_settings_raw('1', cache_ok=True) ==
+           {'uri': 'league/1/settings'})
+    assert(yh.get.call_count == 3)
+    yh.get_scoreboard_raw('1', 3)
+    yh.get_scoreboard_raw('1', 3)
+    assert(yh.get.call_count == 5)
+    yh.get_scoreboard_raw('1', 3, cache_ok=True)
+    yh.get_scoreboard_raw('1', 3, cache_ok=True)
+    yh.get_matchup_raw('1.t.2', 3, cache_ok=True)
+    assert(yh.get_matchup_raw('1.t.2', 3, cache_ok=True) ==
+           {'uri': 'team/1.t.2/matchups;weeks=3'})
+    assert(yh.get.call_count == 7)
+
+
+def test_cached_raw_is_shared():
+    # Cached documents are handed out as is, not copied, to every caller
+    yh = yhandler.get_handler(MagicMock())
+    yh.get = MagicMock(side_effect=lambda uri: {'uri': uri})
+    assert(yh.get_scoreboard_raw('1', 3, cache_ok=True) is
+           yh.get_scoreboard_raw('1', 3, cache_ok=True))
+    assert(yh.get_settings_raw('1', cache_ok=True) is
+           yh.get_settings_raw('1', cache_ok=True))
+    assert(yh.get_settings_raw('1') is not yh.get_settings_raw('1'))
+
+
+def test_cache_is_lru():
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(side_effect=lambda uri: {'uri': uri})
+    for wk in range(yhandler._CACHE_SIZE):
+        yh.get_scoreboard_raw('1', wk, cache_ok=True)
+    # Touch week 0 so week 1 is the least recently used when week 64 is added
+    yh.get_scoreboard_raw('1', 0, cache_ok=True)
+    yh.get_scoreboard_raw('1', yhandler._CACHE_SIZE, cache_ok=True)
+    assert(len(yh._cache) == yhandler._CACHE_SIZE)
+    assert('league/1/scoreboard;week=0' in yh._cache)
+    assert('league/1/scoreboard;week=1' not in yh._cache)
+
+
+def test_percent_owned_raw():
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(return_value=None)
+    yh.get_percent_owned_raw('396.l.49770', [3737, 6381])
+    yh.get.assert_called_with(
+        "league/396.l.49770/players;player_keys=396.p.3737,396.p.6381"
+        "/percent_owned")
+
+
+def test_percent_owned_raw_batches():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+
+    def get(uri):
+        with open(dir_path + "/sample.percent_owned.json", "r") as f:
+            return json.load(f)
+
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(side_effect=get)
+    jresp = yh.get_percent_owned_raw('396.l.49770', range(30))
+    assert(yh.get.call_count == 2)
+    uris = sorted(c.args[0] for c in yh.get.call_args_list)
+    assert(uris[0].count(".p.") == 25)
+    assert(uris[1] == "league/396.l.49770/players;player_keys="
+           "396.p.25,396.p.26,396.p.27,396.p.28,396.p.29/percent_owned")
+    players = jresp['fantasy_content']['league'][1]['players']
+    assert(players['count'] == 8)
+    assert(players['7'] == players['3'])
+
+
+def test_get_http_error():
+    sc = MagicMock()
+    sc.session.request.return_value.ok = False
+    sc.session.request.return_value.content = b'<error>Not found</error>'
+    yh = yhandler.YHandler(sc)
+    with pytest.raises(RuntimeError, match="Not found"):
+        yh.get("league/1/standings")
+
+
+def test_put_post_status():
+    sc = MagicMock()
+    response = sc.session.request.return_value
+    yh = yhandler.YHandler(sc)
+    response.status_code = 200
+    assert(yh.put_roster("1.t.2", "<xml/>") is response)
+    sc.session.request.assert_called_with(
+        "PUT", yhandler.YAHOO_ENDPOINT + "/team/1.t.2/roster",
+        timeout=(3.05, 30), data="<xml/>",
+        headers={'Content-Type': 'application/xml'})
+    with pytest.raises(RuntimeError):
+        yh.post_transactions("1", "<xml/>")
+    response.status_code = 201
+    assert(yh.post_transactions("1", "<xml/>") is response)
+
+
+def test_players_raw_stream():
+    pytest.importorskip("ijson")
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    with open(dir_path + "/sample.players.freeagents.C.pg.1.json", "rb") as f:
+        content = f.read()
+    sc = MagicMock()
+    response = sc.session.request.return_value
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [content[:5000], content[5000:]]
+    yh = yhandler.YHandler(sc)
+    plyrs = list(yh.get_players_raw_stream('370.l.56877', 0, 'FA', 'C',
+                                           fields=("player_id", "name",
+                                                   "percent_owned")))
+    assert(sc.session.request.call_args.kwargs['stream'])
+    assert(len(plyrs) == 25)
+    assert(plyrs[0]['player_id'] == '1600')
+    assert(plyrs[0]['name']['full'] == 'Joe Thornton')
+    assert('percent_owned' in plyrs[0])
+    assert(response.__exit__.called)
+
+
+def test_get_handler():
+    sc = MagicMock()
+    yh = yhandler.get_handler(sc)
+    assert(yh.sc is sc)
+    assert(yhandler.get_handler(sc) is yh)
+    assert(yhandler.get_handler(MagicMock()) is not yh)
+
+
+def test_multi_get():
+    yh = yhandler.YHandler('dummy-sc')
+    yh.get = MagicMock(side_effect=lambda uri: {'uri': uri})
+    uris = ["league/1/standings", "league/1/settings", "league/1/scoreboard"]
+    assert(yh.multi_get(uris) == [{'uri': uri} for uri in uris])
+    assert(yh.multi_get([]) == [])
+
+
+def test_get_no_content():
+    sc = MagicMock()
+    response = sc.session.request.return_value
+    response.status_code = 204
+    response.content = b''
+    yh = yhandler.YHandler(sc)
+    assert(yh.get("league/1/standings") == {})
+    response.status_code = 200
+    assert(yh.get("league/1/standings") == {})
+
+
+def test_players_raw_stream_float_and_error():
+    pytest.importorskip("ijson")
+    sc = MagicMock()
+    response = sc.session.request.return_value
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [
+        b'{"fantasy_content": {"league": [{}, {"players": {"0": {"player": '
+        b'[[{"player_id": "1"}], {"percent_owned": {"value": 12.5}}]}, '
+        b'"count": 1}}]}}']
+    yh = yhandler.YHandler(sc)
+    plyrs = list(yh.get_players_raw_stream('1', 0, 'A',
+                                           fields=("percent_owned",)))
+    assert(plyrs == [{'percent_owned': {'value': 12.5}}])
+    assert(type(plyrs[0]['percent_owned']['value']) is float)
+    response.iter_content.return_value = [
+        b'{"error": {"description": "Invalid league"}}']
+    with pytest.raises(RuntimeError):
+        list(yh.get_players_raw_stream('1', 0, 'A'))
@@ -1,8 +1,134 @@
 #!/bin/python
 
 import json
+import requests
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 YAHOO_ENDPOINT = 'https://fantasysports.yahooapis.com/fantasy/v2'
+_FORMAT_JSON = {'format': 'json'}
+_XML_HEADERS = {'Content-Type': 'application/xml'}
+_POOL_CONNECTIONS = 4
+_POOL_MAXSIZE = 20
+# POST is left out as transactions aren't idempotent.  Retrying one that
+# Yahoo! processed before failing could repeat the add or drop.
+_RETRY = Retry(total=3, backoff_factor=0.3,
+               status_forcelist=[429, 500, 502, 503, 504],
+               allowed_methods=["GET", "PUT"],
+               raise_on_status=False)
+_TIMEOUT = (3.05, 30)
+_MAX_WORKERS = 8
+_PLAYERS_PER_PAGE = 25
+_CACHE_SIZE = 64
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _merge_players(pages):
+    """Combine the players of several league/players responses into one
+
+    :param pages: JSON documents of each response, in order
+    :type pages: list
+    :return: JSON document with the players of all of the pages, numbered in
+    order as if they came from a single response.
+    """
+    merged = pages[0]
+    players = merged['fantasy_content']['league'][1]['players']
+    count = players['count']
+    for page in pages[1:]:
+        pg_players = page['fantasy_content']['league'][1]['players']
+        for i in range(pg_players['count']):
+            players[str(count)] = pg_players[str(i)]
+            count += 1
+    players['count'] = count
+    return merged
+
+
+def _player_fields(plyr, fields):
+    """Flatten a player of a league/players response and pick out fields
+
+    :param plyr: Player entry of the response
+    :type plyr: dict
+    :param fields: Fields of the player to return
+    :type fields: tuple(str)
+    :return: The requested fields that the player has
+    :rtype: dict
+    """
+    attrs = {}
+    for ele in plyr['player'][0] + plyr['player'][1:]:
+        if isinstance(ele, dict):
+            attrs.update(ele)
+    return {f: attrs[f] for f in fields if f in attrs}
+
+
+def _prime(func):
+    # Advance a generator based coroutine to its first yield
+    def start(*args, **kwargs):
+        coro = func(*args, **kwargs)
+        next(coro)
+        return coro
+    return start
+
+
+def _players_parser():
+    """Return an ijson coroutine that parses a league/players response
+
+    Send the coroutine each chunk of the response as it arrives.  Every
+    player that has been fully parsed is appended to the returned list as a
+    (key, player) pair, where the players' count also shows up as a pair.
+    Numbers are parsed as float, like the json module does.
+
+    :return: The coroutine and the list it adds the players to
+    :raises: RuntimeError, from send, if the response is an error document
+    """
+    import ijson
+    from ijson.common import kvitems_basecoro
+    players = ijson.sendable_list()
+    target = kvitems_basecoro(players, 'fantasy_content.league.item.players')
+    return ijson.parse_coro(_error_checker(target), use_float=True), players
+
+
+@_prime
+def _error_checker(target):
+    # Pass the parse events on to target, stopping at a top-level error key
+    while True:
+        prefix, event, value = (yield)
+        if prefix == '' and event == 'map_key' and value == 'error':
+            raise RuntimeError("Yahoo! returned an error document")
+        target.send((prefix, event, value))
+
+
+# Handlers keyed by the id of their session context.  The values are weak so
+# that a handler, and the context it references, go away once nothing else
+# uses them.
+_HANDLERS = weakref.WeakValueDictionary()
+
+
+def get_handler(sc):
+    """Return the YHandler shared by everything using a session context
+
+    Sharing the handler means sharing its pooled connections and response
+    cache, rather than each Game, League and Team opening its own.  Only
+    responses requested with cache_ok=True are cached, so they are the only
+    ones a new object can get from an earlier one.
+
+    :param sc: Fully constructed session context
+    :type sc: :class:`yahoo_oauth.OAuth2`
+    :return: Handler for the session context
+    :rtype: YHandler
+    """
+    handler = _HANDLERS.get(id(sc))
+    if handler is None:
+        handler = YHandler(sc)
+        _HANDLERS[id(sc)] = handler
+    return handler
 
 
 class YHandler:
@@ -10,22 +136,131 @@ class YHandler:
 
     def __init__(self, sc):
         self.sc = sc
+        self._base = YAHOO_ENDPOINT + "/"
+        self._session = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._lg_pref_cache = {}
+
+    def _pooled_session(self):
+        """Return the session of the context, set up for connection pooling
+
+        The session is configured once with a keep-alive pool and transient
+        error retries so that successive calls reuse the same connections to
+        Yahoo!.  The session context can replace its session when the token
+        is refreshed, in which case the new one is configured on first use.
+
+        The bound request method is returned, rather than stored on the
+        handler, so that threads sharing the handler never pair a session
+        with the request method of another.
+
+        :return: The request method of the session to send the API requests
+        through
+        """
+        session = self.sc.session
+        if session is not self._session:
+            if isinstance(session, requests.Session):
+                session.mount("https://",
+                              HTTPAdapter(pool_connections=_POOL_CONNECTIONS,
+                                          pool_maxsize=_POOL_MAXSIZE,
+                                          max_retries=_RETRY))
+            self._session = session
+        return session.request
+
+    def _request(self, method, uri, expected_status=None, **kwargs):
+        """Send a request for the URI through the pooled session
+
+        :param method: HTTP method of the request
+        :type method: str
+        :param uri: URI of the API to call
+        :type uri: str
+        :param expected_status: Status code the response must have.  If None,
+        any successful status is accepted.
+        :type expected_status: int
+        :param kwargs: Additional arguments to pass to the session
+        :return: Response of the request
+        :raises: RuntimeError if the response doesn't have the expected status
+        """
+        session_request = self._pooled_session()
+        response = session_request(method, self._base + uri,
+                                   timeout=_TIMEOUT, **kwargs)
+        if expected_status is None:
+            if not response.ok:
+                raise RuntimeError(response.content)
+        elif response.status_code != expected_status:
+            raise RuntimeError(response.content)
+        return response
 
     def get(self, uri):
         """Send an API request to the URI and return the response as JSON
 
         :param uri: URI of the API to call
         :type uri: str
-        :return: JSON document of the response
+        :return: JSON document of the response.  This is empty if the
+        response has no content.
         :raises: RuntimeError if any response comes back with an error
         """
-        response = self.sc.session.get("{}/{}".format(YAHOO_ENDPOINT, uri),
-                                       params={'format': 'json'})
-        jresp = response.json()
+        response = self._request("GET", uri, params=_FORMAT_JSON)
+        if response.status_code == 204 or not response.content:
+            return {}
+        jresp = _json_loads(response.content)
         if "error" in jresp:
             raise RuntimeError(json.dumps(jresp))
         return jresp
 
+    def _get_cached(self, uri):
+        """Like get, but return the response of a prior call to the same URI
+
+        Only use this for URIs whose response can no longer change.  The
+        same document is returned to every caller, so it must not be changed.
+
+        :param uri: URI of the API to call
+        :type uri: str
+        :return: JSON document of the response
+        """
+        jresp = self._cache_lookup(uri)
+        if jresp is None:
+            jresp = self.get(uri)
+            self._cache_store(uri, jresp)
+        return jresp
+
+    def _cache_lookup(self, uri):
+        with self._cache_lock:
+            jresp = self._cache.get(uri)
+            if jresp is not None:
+                self._cache.move_to_end(uri)
+            return jresp
+
+    def _cache_store(self, uri, jresp):
+        # Evict the least recently used responses past the cache size
+        with self._cache_lock:
+            self._cache[uri] = jresp
+            self._cache.move_to_end(uri)
+            while len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def multi_get(self, uris):
+        """Call get for each URI concurrently over the pooled session
+
+        Use this in place of a sequence of get calls for unrelated resources,
+        so the total time is close to that of the slowest request:
+
+        >>> standings, settings = yh.multi_get([
+        ...     f"league/{league_id}/standings",
+        ...     f"league/{league_id}/settings"])
+
+        :param uris: URIs of the APIs to call
+        :type uris: list(str)
+        :return: JSON document of each response, in the order of the URIs
+        :rtype: list
+        :raises: RuntimeError if any response comes back with an error
+        """
+        if len(uris) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(uris),
+                                                _MAX_WORKERS)) as ex:
+            return list(ex.map(self.get, uris))
+
     def put(self, uri, data):
         """Calls the PUT method to the uri with a payload
 
@@ -36,12 +271,7 @@ class YHandler:
         :return: XML document of the response
         :raises: RuntimeError if any response comes back with an error
         """
-        headers = {'Content-Type': 'application/xml'}
-        response = self.sc.session.put("{}/{}".format(YAHOO_ENDPOINT, uri),
-                                       data=data, headers=headers)
-        if response.status_code != 200:
-            raise RuntimeError(response.content)
-        return response
+        return self._request("PUT", uri, 200, data=data, headers=_XML_HEADERS)
 
     def post(self, uri, data):
         """Calls the POST method to the URI with a payload
@@ -53,12 +283,8 @@ class YHandler:
         :return: XML document of the response
         :raises: RuntimeError if any response comes back with an error
         """
-        headers = {'Content-Type': 'application/xml'}
-        response = self.sc.session.post("{}/{}".format(YAHOO_ENDPOINT, uri),
-                                        data=data, headers=headers)
-        if response.status_code != 201:
-            raise RuntimeError(response.content)
-        return response
+        return self._request("POST", uri, 201, data=data,
+                             headers=_XML_HEADERS)
 
     def get_teams_raw(self):
         """Return the raw JSON when requesting the logged in players teams.
@@ -74,27 +300,44 @@ class YHandler:
         :type league_id: str
         :return: JSON document of the request.
         """
-        return self.get("league/{}/standings".format(league_id))
+        return self.get(f"league/{league_id}/standings")
 
-    def get_settings_raw(self, league_id):
+    def get_settings_raw(self, league_id, cache_ok=False):
         """Return the raw JSON when requesting settings for a league.
 
         :param league_id: League ID to get the standings for
         :type league_id: str
+        :param cache_ok: Reuse the response of a prior request for the same
+        league.  The settings include the current week and the edit date,
+        so only pass True when those aren't needed.  A reused document is
+        shared with every other caller of the handler, so it must not be
+        changed.
+        :type cache_ok: bool
         :return: JSON document of the request.
         """
-        return self.get("league/{}/settings".format(league_id))
+        uri = f"league/{league_id}/settings"
+        if cache_ok:
+            return self._get_cached(uri)
+        return self.get(uri)
 
-    def get_matchup_raw(self, team_key, week):
+    def get_matchup_raw(self, team_key, week, cache_ok=False):
         """Return the raw JSON when requesting match-ups for a team
 
         :param team_key: Team key identifier to find the matchups for
         :type team_key: str
         :param week: What week number to request the matchup for?
         :type week: int
+        :param cache_ok: Reuse the response of a prior request for the same
+        week.  Only pass True when the week has already been played.  A
+        reused document is shared with every other caller of the handler, so
+        it must not be changed.
+        :type cache_ok: bool
         :return: JSON of the request
         """
-        return self.get("team/{}/matchups;weeks={}".format(team_key, week))
+        uri = f"team/{team_key}/matchups;weeks={week}"
+        if cache_ok:
+            return self._get_cached(uri)
+        return self.get(uri)
 
     def get_roster_raw(self, team_key, week=None, day=None):
         """Return the raw JSON when requesting a team's roster
@@ -110,27 +353,31 @@ class YHandler:
         :type day: datetime.date
         :return: JSON of the request
         """
-        if week is not None:
-            param = ";week={}".format(week)
-        elif day is not None:
-            param = ";date={}".format(day.strftime("%Y-%m-%d"))
-        else:
-            param = ""
-        return self.get("team/{}/roster{}".format(team_key, param))
+        uri = f"team/{team_key}/roster" + (
+            f";week={week}" if week is not None else
+            f";date={day.year:04d}-{day.month:02d}-{day.day:02d}"
+            if day is not None else "")
+        return self.get(uri)
 
-    def get_scoreboard_raw(self, league_id, week=None):
+    def get_scoreboard_raw(self, league_id, week=None, cache_ok=False):
         """Return the raw JSON when requesting the scoreboard for a week
 
         :param league_id: League ID to get the standings for
         :type league_id: str
         :param week: The week number to request the scoreboard for
         :type week: int
+        :param cache_ok: Reuse the response of a prior request for the same
+        week.  Only pass True when the week has already been played.  A
+        reused document is shared with every other caller of the handler, so
+        it must not be changed.
+        :type cache_ok: bool
         :return: JSON document of the request.
         """
-        week_uri = ""
-        if week is not None:
-            week_uri = ";week={}".format(week)
-        return self.get("league/{}/scoreboard{}".format(league_id, week_uri))
+        uri = f"league/{league_id}/scoreboard" + (
+            f";week={week}" if week is not None else "")
+        if cache_ok:
+            return self._get_cached(uri)
+        return self.get(uri)
 
     def get_players_raw(self, league_id, start, status, position=None):
         """Return the raw JSON when requesting players in the league
@@ -153,13 +400,78 @@ class YHandler:
         :type position: str
         :return: JSON document of the request.
         """
-        if position is None:
-            pos_parm = ""
-        else:
-            pos_parm = ";position={}".format(position)
-        return self.get(
-            "league/{}/players;start={};count=25;status={}{}/percent_owned".
-            format(league_id, start, status, pos_parm))
+        return self.get(self._players_uri(league_id, start, status, position))
+
+    def get_players_raw_stream(self, league_id, start, status, position=None,
+                               fields=("player_id", "name", "status")):
+        """Yield the players in the league one at a time as they are parsed
+
+        This requests the same page of 25 players as get_players_raw, but
+        parses the response incrementally with ijson, which must be installed.
+        Only the requested fields of each player are kept, so the full
+        document is never held in memory.
+
+        :param league_id: League ID to get the players for
+        :type league_id: str
+        :param start: The output is paged at 25 players each time.  See
+        get_players_raw.
+        :type start: int
+        :param status: A filter to limit the player status.  See
+        get_players_raw for the available values.
+        :type status: str
+        :param position: A filter to return players only for a specific
+        position.  If None is passed, then no position filtering occurs.
+        :type position: str
+        :param fields: Fields of each player to return
+        :type fields: tuple(str)
+        :return: Generator of a dict for each player with the requested fields
+        :raises: RuntimeError if the response comes back with an error
+        """
+        parser, players = _players_parser()
+        response = self._request(
+            "GET", self._players_uri(league_id, start, status, position),
+            params=_FORMAT_JSON, stream=True)
+        with response:
+            for chunk in response.iter_content(_STREAM_CHUNK_SIZE):
+                parser.send(chunk)
+                for key, plyr in players:
+                    if key != 'count':
+                        yield _player_fields(plyr, fields)
+                del players[:]
+        parser.close()
+
+    def _players_uri(self, league_id, start, status, position):
+        pos_parm = f";position={position}" if position is not None else ""
+        return f"league/{league_id}/players;start={start};count=25;" \
+            f"status={status}{pos_parm}/percent_owned"
+
+    def get_players_raw_range(self, league_id, start, end, status,
+                              position=None):
+        """Return the raw JSON of each page of players in a range
+
+        The pages are requested concurrently over the pooled session, rather
+        than one at a time as successive calls to get_players_raw would.
+
+        :param league_id: League ID to get the players for
+        :type league_id: str
+        :param start: Index of the first player to return.  Pages of 25
+        players are requested starting from this index.
+        :type start: int
+        :param end: Index to stop at.  The last page requested is the one that
+        starts before this index.
+        :type end: int
+        :param status: A filter to limit the player status.  See
+        get_players_raw for the available values.
+        :type status: str
+        :param position: A filter to return players only for a specific
+        position.  If None is passed, then no position filtering occurs.
+        :type position: str
+        :return: JSON document of each page, in the order of the pages
+        :rtype: list
+        """
+        return self.multi_get([
+            self._players_uri(league_id, pg, status, position)
+            for pg in range(start, end, _PLAYERS_PER_PAGE)])
 
     def get_player_raw(self, league_id, player_name):
         """Return the raw JSON when requesting player details
@@ -172,8 +484,8 @@ class YHandler:
         """
         player_stat_uri = ""
         if player_name is not None:
-            player_stat_uri = "players;search={}/stats".format(player_name)
-        return self.get("league/{}/{}".format(league_id, player_stat_uri))
+            player_stat_uri = f"players;search={player_name}/stats"
+        return self.get(f"league/{league_id}/{player_stat_uri}")
 
     def get_percent_owned_raw(self, league_id, player_ids):
         """Return the raw JSON when requesting the percentage owned of players
@@ -184,11 +496,37 @@ class YHandler:
         :type player_ids: list(str)
         :return: JSON document of the request
         """
-        lg_pref = league_id[0:league_id.find(".")]
-        joined_ids = ",".join([lg_pref + ".p." + str(i) for i in player_ids])
-        return self.get(
-            "league/{}/players;player_keys={}/percent_owned".
-            format(league_id, joined_ids))
+        uris = self._percent_owned_uris(league_id, player_ids)
+        if len(uris) == 1:
+            return self.get(uris[0])
+        return _merge_players(self.multi_get(uris))
+
+    def _percent_owned_uris(self, league_id, player_ids):
+        """Return the URIs to get the percentage owned of the players
+
+        Yahoo! returns at most 25 players for a request, so the players are
+        split into batches of that size with a URI for each one.
+
+        :param league_id: League ID we are requesting data from
+        :type league_id: str
+        :param player_ids: Yahoo! Player IDs to retrieve % owned for
+        :type player_ids: list(str)
+        :return: URI of each batch
+        :rtype: list(str)
+        """
+        lg_pref = self._lg_pref_cache.get(league_id)
+        if lg_pref is None:
+            lg_pref = league_id.split(".", 1)[0]
+            self._lg_pref_cache[league_id] = lg_pref
+        player_ids = list(player_ids)
+        uris = []
+        for i in range(0, max(len(player_ids), 1), _PLAYERS_PER_PAGE):
+            joined_ids = ",".join(
+                f"{lg_pref}.p.{pid}"
+                for pid in player_ids[i:i + _PLAYERS_PER_PAGE])
+            uris.append(f"league/{league_id}/players;"
+                        f"player_keys={joined_ids}/percent_owned")
+        return uris
 
     def put_roster(self, team_key, xml):
         """Calls PUT against the roster API passing it an xml document
@@ -199,7 +537,7 @@ class YHandler:
         :type xml: str
         :return: Response from the PUT
         """
-        return self.put("team/{}/roster".format(team_key), xml)
+        return self.put(f"team/{team_key}/roster", xml)
 
     def post_transactions(self, league_id, xml):
         """Calls POST against the transaction API passing it an xml document
@@ -210,4 +548,4 @@ class YHandler:
         :type xml: str
         :return: Response from the POST
         """
-        return self.post("league/{}/transactions".format(league_id), xml)
+        return self.post(f"league/{league_id}/transactions", xml)